@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import json
-from typing import Literal, TypedDict, Optional, Dict, Any
+import time
+from typing import Literal, TypedDict, Optional, Dict, Any, Tuple, get_args
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
-from .llm import get_llm
+from .llm import get_llm, get_chat_model, schedule
+from .config import PLANNER_MODE
 from .tools.appointments import book_appointment, list_available_slots
 from .tools.medical_records import summarize_patient_history
 from .tools.disease_info import get_disease_information
@@ -14,9 +16,13 @@ from .tools.medical_history_admin import add_or_update_history
 from .memory import get_patient_context
 
 
+TaskType = Literal["BOOK_APPOINTMENT", "PATIENT_SUMMARY",
+                   "DISEASE_INFO", "UPDATE_HISTORY"]
+TASK_TYPES = get_args(TaskType)
+
+
 class Plan(TypedDict, total=False):
-    task_type: Literal["BOOK_APPOINTMENT", "PATIENT_SUMMARY",
-                       "DISEASE_INFO", "UPDATE_HISTORY"]
+    task_type: TaskType
     patient_name: Optional[str]
     reason: Optional[str]
     speciality: Optional[str]
@@ -27,11 +33,57 @@ class Plan(TypedDict, total=False):
     note: Optional[str]
 
 
-def _plan_from_query(user_query: str) -> Plan:
+# Compact function schema for structured planning. The model fills it in via
+# tool calling, so no JSON has to be scraped out of free text.
+PLAN_SCHEMA: Dict[str, Any] = {
+    "title": "plan",
+    "description": "Route a healthcare assistant request and extract its fields.",
+    "type": "object",
+    "properties": {
+        "task_type": {
+            "type": "string",
+            "enum": list(TASK_TYPES),
+        },
+        "patient_name": {"type": ["string", "null"], "description": "full name"},
+        "reason": {"type": ["string", "null"], "description": "visit reason"},
+        "speciality": {"type": ["string", "null"], "description": "e.g. nephrologist"},
+        "date": {"type": ["string", "null"], "description": "YYYY-MM-DD if explicit"},
+        "disease": {"type": ["string", "null"], "description": "disease or question"},
+        "conditions": {"type": ["string", "null"], "description": "conditions to store"},
+        "medications": {"type": ["string", "null"], "description": "medications to store"},
+        "note": {"type": ["string", "null"], "description": "note to store"},
+    },
+    "required": ["task_type"],
+}
+
+
+def _fallback_plan(user_query: str) -> Plan:
+    return {
+        "task_type": "DISEASE_INFO",
+        "patient_name": None,
+        "reason": None,
+        "speciality": None,
+        "date": None,
+        "disease": user_query,
+        "conditions": None,
+        "medications": None,
+        "note": None,
+    }
+
+
+def _usage(message: Any) -> Dict[str, Optional[int]]:
+    usage = getattr(message, "usage_metadata", None) or {}
+    return {
+        "prompt_tokens": usage.get("input_tokens"),
+        "completion_tokens": usage.get("output_tokens"),
+    }
+
+
+def _plan_with_prompt(user_query: str) -> Tuple[Plan, Dict[str, Any]]:
     """
     Use LLM as a planner to decompose the user's intent.
     """
-    llm = get_llm()
+    llm = get_llm(priority="interactive")
     prompt = ChatPromptTemplate.from_template(
         """You are a planning agent for a healthcare assistant.
 
@@ -57,29 +109,79 @@ User message:
 {query}
 """
     )
-    chain = prompt | llm | StrOutputParser()
-    raw = chain.invoke({"query": user_query})
+    chain = prompt | llm
+    message = chain.invoke({"query": user_query})
+    raw = StrOutputParser().invoke(message)
 
     first_brace = raw.find("{")
     last_brace = raw.rfind("}")
     if first_brace != -1 and last_brace != -1:
         raw = raw[first_brace : last_brace + 1]
 
+    fallback = False
     try:
         data = json.loads(raw)
     except json.JSONDecodeError:
-        data = {
-            "task_type": "DISEASE_INFO",
-            "patient_name": None,
-            "reason": None,
-            "speciality": None,
-            "date": None,
-            "disease": user_query,
-            "conditions": None,
-            "medications": None,
-            "note": None,
-        }
-    return data  # type: ignore[return-value]
+        data = _fallback_plan(user_query)
+        fallback = True
+    return data, {"mode": "prompt", "fallback": fallback, **_usage(message)}  # type: ignore[return-value]
+
+
+def _plan_structured(user_query: str) -> Tuple[Plan, Dict[str, Any]]:
+    """
+    Plan via schema-bound function calling with a short prompt. Falls back
+    to the free-text planner if the model returns no valid tool call.
+    """
+    model = get_chat_model().with_structured_output(
+        PLAN_SCHEMA, method="function_calling", include_raw=True
+    )
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                "Healthcare assistant planner. Call `plan` for the user's message. "
+                "Use null for fields not mentioned.",
+            ),
+            ("human", "{query}"),
+        ]
+    )
+    try:
+        result = (prompt | schedule(model, "interactive")).invoke({"query": user_query})
+    except Exception as e:
+        # Only a rejected tool call falls back (Groq answers 400
+        # "tool_use_failed"); rate limits and other errors that survived
+        # the scheduler's retries propagate instead of doubling the load.
+        if getattr(e, "status_code", None) != 400 or "tool_use_failed" not in str(e):
+            raise
+        result = {}
+    usage = _usage(result.get("raw"))
+
+    parsed = result.get("parsed")
+    if not isinstance(parsed, dict) or parsed.get("task_type") not in TASK_TYPES:
+        plan, stats = _plan_with_prompt(user_query)
+        # Count both calls so the trace reflects what the request cost.
+        for key in ("prompt_tokens", "completion_tokens"):
+            if usage[key] is not None and stats[key] is not None:
+                stats[key] += usage[key]
+        return plan, {**stats, "mode": "structured", "fallback": True}
+
+    plan: Plan = {key: parsed.get(key) for key in PLAN_SCHEMA["properties"]}  # type: ignore[assignment]
+    return plan, {"mode": "structured", "fallback": False, **usage}
+
+
+def _plan_from_query(user_query: str, mode: Optional[str] = None) -> Tuple[Plan, Dict[str, Any]]:
+    """
+    Plan the request and return it with planner stats for the trace:
+    mode, fallback, prompt/completion tokens and latency.
+    """
+    mode = mode or PLANNER_MODE
+    started = time.perf_counter()
+    if mode == "structured":
+        plan, stats = _plan_structured(user_query)
+    else:
+        plan, stats = _plan_with_prompt(user_query)
+    stats["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return plan, stats
 
 
 def run_agent(user_query: str) -> Dict[str, Any]:
@@ -87,7 +189,7 @@ def run_agent(user_query: str) -> Dict[str, Any]:
     Main entry: take user query, plan, call the right tool,
     and return both the final answer and a detailed trace.
     """
-    plan = _plan_from_query(user_query)
+    plan, planner_stats = _plan_from_query(user_query)
     task = plan.get("task_type")
     tool_name = ""
     tool_input: Dict[str, Any] = {}
@@ -150,6 +252,7 @@ def run_agent(user_query: str) -> Dict[str, Any]:
     trace: Dict[str, Any] = {
         "user_query": user_query,
         "plan": plan,
+        "planner": planner_stats,
         "selected_tool": tool_name,
         "tool_input": tool_input,
         "tool_output_preview": tool_output[:400],
@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .evaluation import JSONL_LOG_FILE, LOG_FILE
+from .llm import _is_retryable, get_chat_model, schedule
+
+# Offline re-scoring of logged interactions.
+#
+# Several question/answer pairs are packed into one judge request that
+# returns a score object per item id. Batches run concurrently at "batch"
+# priority in the LLM scheduler, every finished batch is appended to a
+# checkpoint file, and a rerun skips ids already present there.
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+CHECKPOINT_FILE = BASE_DIR / "eval_checkpoint.jsonl"
+REPORT_FILE = BASE_DIR / "eval_report.json"
+
+# Keeps one batch prompt well inside the model context.
+MAX_ANSWER_CHARS = 2000
+# Characters of an unusable judge reply kept in the warning log.
+MAX_LOGGED_REPLY_CHARS = 500
+
+_SCORE = {"type": "integer", "minimum": 1, "maximum": 5}
+JUDGE_SCHEMA: Dict[str, Any] = {
+    "title": "scores",
+    "description": "Scores for every evaluated item.",
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "correctness": _SCORE,
+                    "relevance": _SCORE,
+                    "explanation": {"type": "string", "description": "one sentence"},
+                },
+                "required": ["id", "correctness", "relevance", "explanation"],
+            },
+        },
+    },
+    "required": ["results"],
+}
+
+_LINE = re.compile(r"^\[(?P<ts>[^\]]+)\] (?P<tag>USER|ANSWER|TRACE|EVAL): ?(?P<text>.*)$")
+
+
+def _interaction_id(ts: str, question: str, answer: str) -> str:
+    raw = f"{ts}\n{question.strip()}\n{answer.strip()}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _parse_text_log(path: Path) -> Iterable[Dict[str, Any]]:
+    """Best-effort reader for the human-readable agent_logs.txt format."""
+    record: Optional[Dict[str, Any]] = None
+    field = None
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            m = _LINE.match(line.rstrip("\n"))
+            if m and m["tag"] == "USER":
+                if record is not None:
+                    yield record
+                record = {"timestamp": m["ts"], "user_query": m["text"], "answer": ""}
+                field = "user_query"
+            elif m and record is not None:
+                field = {"ANSWER": "answer", "TRACE": None, "EVAL": None}[m["tag"]]
+                if field:
+                    record[field] = m["text"]
+            elif record is not None and field:
+                # Multi-line answers continue until the next tagged line.
+                record[field] += "\n" + line.rstrip("\n")
+    if record is not None:
+        yield record
+
+
+def load_logged_interactions() -> List[Dict[str, Any]]:
+    """
+    Interactions from agent_logs.jsonl plus any older ones only present in
+    agent_logs.txt, each with a stable "id".
+    """
+    items: Dict[str, Dict[str, Any]] = {}
+    sources = []
+    if LOG_FILE.exists():
+        sources.append(_parse_text_log(LOG_FILE))
+    if JSONL_LOG_FILE.exists():
+        with JSONL_LOG_FILE.open("r", encoding="utf-8") as f:
+            sources.append([json.loads(line) for line in f if line.strip()])
+
+    # JSONL last so its richer records (with trace) win on duplicates.
+    for source in sources:
+        for rec in source:
+            question = (rec.get("user_query") or "").strip()
+            answer = (rec.get("answer") or "").strip()
+            if not question or not answer:
+                continue
+            rid = _interaction_id(rec["timestamp"], question, answer)
+            trace = rec.get("trace") or {}
+            items[rid] = {
+                "id": rid,
+                "timestamp": rec["timestamp"],
+                "question": question,
+                "answer": answer,
+                "tool": trace.get("selected_tool") if isinstance(trace, dict) else None,
+            }
+    return list(items.values())
+
+
+def _judge_batch(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Score several QA pairs in one schema-bound LLM call. Unscored items are
+    omitted; an unusable reply is logged and scores nothing.
+    """
+    model = get_chat_model().with_structured_output(
+        JUDGE_SCHEMA, method="function_calling", include_raw=True
+    )
+    payload = [
+        {"id": it["id"], "question": it["question"], "answer": it["answer"][:MAX_ANSWER_CHARS]}
+        for it in items
+    ]
+    prompt = (
+        "You are an evaluator. You will be given a JSON list of items, each with "
+        "an id, a question and an answer.\n"
+        "For EVERY item rate the answer 1-5 for correctness and 1-5 for relevance, "
+        "and give a one-sentence explanation. Call `scores` with one entry per item id.\n\n"
+        f"ITEMS:\n{json.dumps(payload, ensure_ascii=False)}\n"
+    )
+    ids = [it["id"] for it in items]
+    try:
+        result = schedule(model, "batch").invoke(prompt)
+    except Exception as e:
+        # A malformed tool call is rejected with 400 "tool_use_failed";
+        # treat it like any other unusable reply.
+        if getattr(e, "status_code", None) != 400 or "tool_use_failed" not in str(e):
+            raise
+        logger.warning(
+            "Judge tool call rejected for batch %s: %s", ids, str(e)[:MAX_LOGGED_REPLY_CHARS]
+        )
+        return []
+
+    parsed = result.get("parsed")
+    results = parsed.get("results") if isinstance(parsed, dict) else None
+    if not isinstance(results, list):
+        raw = result.get("raw")
+        reply = getattr(raw, "tool_calls", None) or getattr(raw, "content", raw)
+        logger.warning(
+            "Unusable judge reply for batch %s (%r): %s",
+            ids,
+            result.get("parsing_error"),
+            str(reply)[:MAX_LOGGED_REPLY_CHARS],
+        )
+        return []
+
+    by_id = {it["id"]: it for it in items}
+    scored = []
+    for r in results:
+        if not isinstance(r, dict) or r.get("id") not in by_id:
+            continue
+        item = by_id.pop(r["id"])
+        scored.append(
+            {
+                "id": item["id"],
+                "timestamp": item["timestamp"],
+                "tool": item["tool"],
+                "correctness": r.get("correctness"),
+                "relevance": r.get("relevance"),
+                "explanation": r.get("explanation"),
+            }
+        )
+    if by_id:
+        logger.warning("Judge returned no score for %s", sorted(by_id))
+    return scored
+
+
+def _read_checkpoint(path: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Load scored rows. A run killed mid-write leaves an unterminated last
+    line; it is truncated away so later appends start on a clean line.
+    """
+    if not path.exists():
+        return {}
+    with path.open("rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+            data = data[:end]
+
+    rows: Dict[str, Dict[str, Any]] = {}
+    for line in data.decode("utf-8", errors="replace").splitlines():
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning("Skipping undecodable checkpoint line in %s", path)
+            continue
+        rows[row["id"]] = row
+    return rows
+
+
+def _mean(values: List[Any]) -> Optional[float]:
+    nums = [float(v) for v in values if isinstance(v, (int, float))]
+    return round(sum(nums) / len(nums), 3) if nums else None
+
+
+def build_report(scores: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    scores = list(scores)
+    by_tool: Dict[str, List[Dict[str, Any]]] = {}
+    for s in scores:
+        by_tool.setdefault(s.get("tool") or "unknown", []).append(s)
+    distribution = {
+        key: {str(n): sum(1 for s in scores if s.get(key) == n) for n in range(1, 6)}
+        for key in ("correctness", "relevance")
+    }
+    return {
+        "scored": len(scores),
+        "mean_correctness": _mean([s.get("correctness") for s in scores]),
+        "mean_relevance": _mean([s.get("relevance") for s in scores]),
+        "distribution": distribution,
+        "by_tool": {
+            tool: {
+                "scored": len(rows),
+                "mean_correctness": _mean([r.get("correctness") for r in rows]),
+                "mean_relevance": _mean([r.get("relevance") for r in rows]),
+            }
+            for tool, rows in by_tool.items()
+        },
+    }
+
+
+def reevaluate_logs(
+    batch_size: int = 8,
+    workers: int = 4,
+    checkpoint: Path = CHECKPOINT_FILE,
+    report: Path = REPORT_FILE,
+    limit: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Re-score every logged interaction not yet in `checkpoint`, then write an
+    aggregate report over the whole checkpoint to `report` and return it.
+    Delete the checkpoint to re-score from scratch after a prompt/model change.
+    """
+    started = time.perf_counter()
+    done = _read_checkpoint(checkpoint)
+    todo = [it for it in load_logged_interactions() if it["id"] not in done]
+    if limit is not None:
+        todo = todo[:limit]
+    batches = [todo[i : i + batch_size] for i in range(0, len(todo), batch_size)]
+
+    lock = threading.Lock()
+    failed = 0
+
+    def run(batch: List[Dict[str, Any]]) -> None:
+        nonlocal failed
+        try:
+            scored = _judge_batch(batch)
+        except Exception as e:
+            if not _is_retryable(e):
+                # Auth failures, bad requests, bugs: stop the run; finished
+                # batches are already checkpointed.
+                logger.exception("Judge batch failed")
+                raise
+            # Rate limit / 5xx persisted through the scheduler's retries;
+            # leave these items for the next resume.
+            logger.warning("Judge batch gave up after retries: %r", e)
+            scored = []
+        with lock:
+            failed += len(batch) - len(scored)
+            with checkpoint.open("a", encoding="utf-8") as f:
+                for row in scored:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                    done[row["id"]] = row
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run, batches))
+
+    result = build_report(done.values())
+    result.update(
+        {
+            "newly_scored": len(todo) - failed,
+            "unscored_this_run": failed,
+            "batches": len(batches),
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+    )
+    with report.open("w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-score logged interactions in batches.")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--checkpoint", type=Path, default=CHECKPOINT_FILE)
+    parser.add_argument("--report", type=Path, default=REPORT_FILE)
+    args = parser.parse_args()
+
+    print(
+        json.dumps(
+            reevaluate_logs(
+                batch_size=args.batch_size,
+                workers=args.workers,
+                checkpoint=args.checkpoint,
+                report=args.report,
+                limit=args.limit,
+            ),
+            indent=2,
+        )
+    )
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import os
+import resource
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .singleflight import get_group
+
+# Process-wide cache for heavy objects (LLM clients, embeddings, indexes,
+# appointment data). Streamlit reruns only re-execute streamlit_app.py, so
+# anything held here is shared by every session in the server process.
+
+_lock = threading.Lock()
+_entries: Dict[str, Dict[str, Any]] = {}
+_builds = get_group("resource_cache")
+
+
+def path_fingerprint(*paths: Path) -> Tuple:
+    """
+    Cheap change marker for files/directories: (path, mtime_ns, size) for
+    every file found. Missing paths contribute nothing.
+    """
+    items = []
+    for path in paths:
+        if path.is_dir():
+            files = sorted(p for p in path.rglob("*") if p.is_file())
+        elif path.exists():
+            files = [path]
+        else:
+            files = []
+        for f in files:
+            st = f.stat()
+            items.append((str(f), st.st_mtime_ns, st.st_size))
+    return tuple(items)
+
+
+def get_or_create(
+    name: str,
+    factory: Callable[[], Any],
+    fingerprint: Optional[Hashable] = None,
+) -> Any:
+    """
+    Return the cached object for `name`, building it with `factory` when
+    missing or when `fingerprint` differs from the one it was built with.
+    Concurrent builds of the same entry are coalesced.
+    """
+    with _lock:
+        entry = _entries.get(name)
+        if entry is not None and entry["fingerprint"] == fingerprint:
+            entry["hits"] += 1
+            return entry["value"]
+
+    def build():
+        started_at = time.time()
+        started = time.perf_counter()
+        value = factory()
+        # A background swap that landed while this ran is newer; keep it.
+        put(
+            name,
+            value,
+            fingerprint,
+            build_seconds=time.perf_counter() - started,
+            unless_newer_than=started_at,
+        )
+        return value
+
+    return _builds.do((name, fingerprint), build)
+
+
+def put(
+    name: str,
+    value: Any,
+    fingerprint: Optional[Hashable] = None,
+    build_seconds: float = 0.0,
+    unless_newer_than: Optional[float] = None,
+) -> bool:
+    """
+    Insert or atomically replace an entry. With `unless_newer_than` (a
+    time.time() value), an existing entry created after that time is kept
+    instead. Returns whether the entry was written.
+    """
+    with _lock:
+        current = _entries.get(name)
+        if (
+            unless_newer_than is not None
+            and current is not None
+            and current["created"] > unless_newer_than
+        ):
+            return False
+        _entries[name] = {
+            "value": value,
+            "fingerprint": fingerprint,
+            "created": time.time(),
+            "build_seconds": build_seconds,
+            "hits": 0,
+        }
+    return True
+
+
+def peek(name: str, default: Any = None) -> Any:
+    """Return the current value for `name` (possibly stale) or `default`."""
+    with _lock:
+        entry = _entries.get(name)
+        return entry["value"] if entry is not None else default
+
+
+def invalidate(prefix: str = "") -> int:
+    """Drop every entry whose name starts with `prefix` (all when empty)."""
+    with _lock:
+        names = [n for n in _entries if n.startswith(prefix)]
+        for n in names:
+            del _entries[n]
+    return len(names)
+
+
+def _estimate_bytes(value: Any) -> Optional[int]:
+    """Approximate resident size, or None for objects that are not measured."""
+    # pandas DataFrame
+    if hasattr(value, "memory_usage") and hasattr(value, "columns"):
+        return int(value.memory_usage(deep=True).sum())
+    # LangChain FAISS vector store: raw vectors + stored chunk text
+    index = getattr(value, "index", None)
+    if index is not None and hasattr(index, "ntotal"):
+        size = int(index.ntotal) * int(index.d) * 4
+        docs = getattr(getattr(value, "docstore", None), "_dict", {})
+        size += sum(len(d.page_content) for d in docs.values())
+        return size
+    # HuggingFaceEmbeddings: weights and buffers of the sentence-transformers
+    # model (a torch module)
+    model = getattr(value, "_client", None)
+    if model is not None and hasattr(model, "parameters"):
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    # API clients and the like: their real footprint is not visible from
+    # Python, so sys.getsizeof would only report a few hundred bytes.
+    return None
+
+
+def _approx_mb(value: Any) -> Optional[float]:
+    size = _estimate_bytes(value)
+    return round(size / 1e6, 2) if size is not None else None
+
+
+def cache_stats() -> List[Dict[str, Any]]:
+    """
+    One row per cached entry with hit count and approximate size
+    (approx_mb is None for objects that are not measured).
+    """
+    with _lock:
+        items = list(_entries.items())
+    return [
+        {
+            "name": name,
+            "type": type(e["value"]).__name__,
+            "approx_mb": _approx_mb(e["value"]),
+            "hits": e["hits"],
+            "build_seconds": round(e["build_seconds"], 2),
+            "age_seconds": int(time.time() - e["created"]),
+        }
+        for name, e in items
+    ]
+
+
+def process_rss_mb() -> Optional[float]:
+    """Current resident set size of this process, or None off Linux."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+
+
+def process_peak_rss_mb() -> float:
+    """
+    High-water mark of this process's resident set size since it started
+    (ru_maxrss is KiB on Linux). Never goes down.
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss /= 1024
+    return round(rss / 1024, 1)
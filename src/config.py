@@ -18,3 +18,25 @@ GROQ_API_KEY = st.secrets.get("GROQ_API_KEY")
 
 if not GROQ_API_KEY:
     raise RuntimeError("GROQ_API_KEY missing. Add it in Streamlit Secrets.")
+
+# Background index builds (see src/indexing.py)
+BACKGROUND_INDEXING = os.getenv("BACKGROUND_INDEXING", "1") == "1"
+INDEX_WATCH_INTERVAL_SECONDS = float(os.getenv("INDEX_WATCH_INTERVAL_SECONDS", "5"))
+
+# One persistent, memory-mapped vector index for all patients
+# (see src/tools/patient_index.py) instead of one index per patient.
+GLOBAL_PATIENT_INDEX = os.getenv("GLOBAL_PATIENT_INDEX", "0") == "1"
+PATIENT_INDEX_DIR = DATA_DIR / "patient_index"
+
+# LLM call scheduler limits (see LLMScheduler in src/llm.py). Defaults
+# follow Groq's free-tier limits for the model above.
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "6000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+
+# Planner: "structured" (function calling) or "prompt" (free-text JSON)
+PLANNER_MODE = os.getenv("PLANNER_MODE", "structured")
+
+# Chunks embedded and added to an index per step when building from PDFs
+INDEX_EMBED_BATCH_SIZE = int(os.getenv("INDEX_EMBED_BATCH_SIZE", "64"))
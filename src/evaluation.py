@@ -1,10 +1,14 @@
 import datetime as dt
+import json
 from pathlib import Path
 from typing import Dict, Any
 
 from .llm import get_llm
 
 LOG_FILE = Path(__file__).resolve().parents[1] / "agent_logs.txt"
+# Machine-readable copy of the same log, one JSON object per interaction,
+# used by the offline re-evaluator (src/batch_evaluation.py).
+JSONL_LOG_FILE = LOG_FILE.with_suffix(".jsonl")
 
 
 def log_interaction(
@@ -23,6 +27,15 @@ def log_interaction(
         if eval_result is not None:
             f.write(f"[{ts}] EVAL: {eval_result}\n")
         f.write("\n")
+    record = {
+        "timestamp": ts,
+        "user_query": user_query,
+        "answer": answer,
+        "trace": trace,
+        "eval": eval_result,
+    }
+    with JSONL_LOG_FILE.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
 
 
 def evaluate_answer(question: str, answer: str) -> Dict[str, Any]:
@@ -32,7 +45,7 @@ def evaluate_answer(question: str, answer: str) -> Dict[str, Any]:
     - relevance
     Returns a small JSON-like dict.
     """
-    llm = get_llm()
+    llm = get_llm(priority="evaluation")
     prompt = (
         "You are an evaluator. You will be given a question and an answer.\n"
         "Rate the answer on a scale of 1-5 for correctness and 1-5 for relevance.\n"
@@ -44,8 +57,6 @@ def evaluate_answer(question: str, answer: str) -> Dict[str, Any]:
     raw = llm.invoke(prompt)
     text = raw.content if hasattr(raw, "content") else str(raw)
     # Try to parse JSON; fall back to plain text
-    import json
-
     first = text.find("{")
     last = text.rfind("}")
     if first != -1 and last != -1:
@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import atexit
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from . import cache
+from .config import DISEASES_DIR, GLOBAL_PATIENT_INDEX, INDEX_WATCH_INTERVAL_SECONDS
+
+# Background index builder.
+#
+# A watcher thread polls the fingerprints of DISEASES_DIR and each patient's
+# PDFs. When one changes, the index is rebuilt in a worker process (keeping
+# PDF parsing and embedding off the request threads), shipped back as bytes
+# and swapped into the resource cache in one step. Readers keep using the
+# previous index until the swap, so they never wait on or see a partial build.
+#
+# With GLOBAL_PATIENT_INDEX, changed patients are embedded in the same worker
+# and only the shard write and manifest swap happen in this process.
+
+_MISSING = object()
+# _pending/_status key for the global patient index job; per-patient retry
+# state is kept under f"{_PATIENT_INDEX_JOB}:{key}".
+_PATIENT_INDEX_JOB = "global_patient_index"
+
+_lock = threading.Lock()
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+_executor: Optional[ProcessPoolExecutor] = None
+# Fingerprint each swapped-in index was built from.
+_built: Dict[str, Hashable] = {}
+_pending: Dict[str, Future] = {}
+# name -> (failed fingerprint, monotonic time before which not to retry it)
+_retry_at: Dict[str, Tuple[Hashable, float]] = {}
+_attempts: Dict[str, int] = {}
+_executor_broken = False
+_status: Dict[str, Any] = {
+    "builds": 0, "swaps": 0, "failures": 0, "worker_restarts": 0,
+    "last_error": None, "last_builds": {},
+}
+
+
+# ---------- BUILDS (run inside the worker process) ----------
+
+def _disease_index_bytes() -> Tuple[Optional[bytes], Optional[Dict[str, Any]]]:
+    from .tools.disease_info import _build_vectorstore
+
+    vs = _build_vectorstore()
+    return (vs.serialize_to_bytes() if vs is not None else None), None
+
+
+def _patient_index_bytes(patient_name: str) -> Tuple[bytes, Optional[Dict[str, Any]]]:
+    from .tools.medical_records import _build_patient_vectorstore, index_build_stats
+
+    data = _build_patient_vectorstore(patient_name).serialize_to_bytes()
+    # Chunk count, timing and the worker's RSS sampled across this build.
+    return data, index_build_stats().get(patient_name)
+
+
+# ---------- WATCHER (runs in the app process) ----------
+
+def _targets() -> List[Tuple[str, Hashable, Callable[..., Any], tuple]]:
+    from .tools.medical_records import PATIENT_FILES, _patient_pdf_paths
+
+    targets = [
+        ("disease_index", cache.path_fingerprint(DISEASES_DIR), _disease_index_bytes, ()),
+    ]
+    if GLOBAL_PATIENT_INDEX:
+        # Patients live in the shared index; see _poll_once.
+        return targets
+    for patient in PATIENT_FILES:
+        targets.append(
+            (
+                f"patient_index:{patient}",
+                cache.path_fingerprint(*_patient_pdf_paths(patient)),
+                _patient_index_bytes,
+                (patient,),
+            )
+        )
+    return targets
+
+
+def _record_failure(name: str, fingerprint: Hashable, error: str) -> None:
+    """
+    Count a failed build and back off before retrying the same fingerprint;
+    a new file change is picked up on the next poll regardless. Caller
+    holds _lock.
+    """
+    _status["failures"] += 1
+    _status["last_error"] = f"{name}: {error}"
+    attempts = _attempts[name] = _attempts.get(name, 0) + 1
+    delay = min(300.0, INDEX_WATCH_INTERVAL_SECONDS * 2 ** attempts)
+    _retry_at[name] = (fingerprint, time.monotonic() + delay)
+
+
+def _record_success(name: str) -> None:
+    """Caller holds _lock."""
+    _attempts.pop(name, None)
+    _retry_at.pop(name, None)
+
+
+def _backing_off(name: str, fingerprint: Hashable) -> bool:
+    """Caller holds _lock."""
+    retry = _retry_at.get(name)
+    return retry is not None and retry[0] == fingerprint and time.monotonic() < retry[1]
+
+
+def _swap(name: str, fingerprint: Hashable, started: float, future: Future) -> None:
+    global _executor_broken
+    from langchain_community.vectorstores import FAISS
+    from .llm import get_embeddings
+
+    with _lock:
+        _pending.pop(name, None)
+    try:
+        data, build_stats = future.result()
+        vs = None
+        if data is not None:
+            # Bytes come from our own worker process, not from user input.
+            vs = FAISS.deserialize_from_bytes(
+                serialized=data,
+                embeddings=get_embeddings(),
+                allow_dangerous_deserialization=True,
+            )
+    except Exception as e:  # keep serving the previous index
+        with _lock:
+            _record_failure(name, fingerprint, repr(e))
+            if isinstance(e, BrokenProcessPool):
+                # The worker died (e.g. OOM); _poll_once starts a new one.
+                _executor_broken = True
+        return
+
+    cache.put(name, vs, fingerprint, build_seconds=time.perf_counter() - started)
+    with _lock:
+        _status["swaps"] += 1
+        _built[name] = fingerprint
+        _record_success(name)
+        if build_stats is not None:
+            _status["last_builds"][name] = build_stats
+
+
+def _apply_patients(
+    due: Dict[str, Hashable], removed: List[str], started: float, future: Future
+) -> None:
+    global _executor_broken
+    from .tools import patient_index
+
+    with _lock:
+        _pending.pop(_PATIENT_INDEX_JOB, None)
+    try:
+        failed = patient_index.apply_embedded(future.result(), due, removed)
+    except Exception as e:  # keep serving the previous manifest
+        failed = {key: repr(e) for key in due}
+        if isinstance(e, BrokenProcessPool):
+            with _lock:
+                _executor_broken = True
+
+    with _lock:
+        for key, fingerprint in due.items():
+            name = f"{_PATIENT_INDEX_JOB}:{key}"
+            if key in failed:
+                _record_failure(name, fingerprint, failed[key])
+            else:
+                _record_success(name)
+        if len(failed) < len(due):
+            _status["swaps"] += 1
+            _status["last_builds"][_PATIENT_INDEX_JOB] = {
+                "patients": len(due) - len(failed),
+                "failed": len(failed),
+                "seconds": round(time.perf_counter() - started, 2),
+            }
+
+
+def _submit(name: str, fn: Callable[..., Any], *args: Any) -> Optional[Future]:
+    """Submit a build to the worker. Caller holds _lock."""
+    global _executor_broken
+    try:
+        future = _executor.submit(fn, *args)
+    except BrokenProcessPool:
+        # Restarted on the next poll.
+        _executor_broken = True
+        return None
+    _status["builds"] += 1
+    _pending[name] = future
+    return future
+
+
+def _poll_targets() -> None:
+    for name, fingerprint, fn, args in _targets():
+        with _lock:
+            if name in _pending or _built.get(name) == fingerprint:
+                continue
+            if _backing_off(name, fingerprint):
+                continue
+            started = time.perf_counter()
+            future = _submit(name, fn, *args)
+        if future is None:
+            return
+        future.add_done_callback(
+            lambda f, n=name, fp=fingerprint, t=started: _swap(n, fp, t, f)
+        )
+
+
+def _poll_patient_index() -> None:
+    from .tools import patient_index
+
+    with _lock:
+        if _PATIENT_INDEX_JOB in _pending:
+            return
+    changed, removed = patient_index.pending_changes()
+    with _lock:
+        due = {
+            key: fingerprint
+            for key, fingerprint in changed.items()
+            if not _backing_off(f"{_PATIENT_INDEX_JOB}:{key}", fingerprint)
+        }
+    if not due:
+        # Dropping patients and compaction only copy stored vectors.
+        patient_index.apply_embedded({}, {}, removed)
+        return
+    with _lock:
+        started = time.perf_counter()
+        # PDF parsing and embedding run in the worker: they hold the GIL
+        # for long stretches and a large bundle must not OOM this process.
+        future = _submit(_PATIENT_INDEX_JOB, patient_index.embed_patients, list(due))
+    if future is not None:
+        future.add_done_callback(
+            lambda f: _apply_patients(due, removed, started, f)
+        )
+
+
+def _poll_once() -> None:
+    _restart_executor_if_broken()
+    _poll_targets()
+    if GLOBAL_PATIENT_INDEX:
+        # After the other targets, and guarded, so a failing patient sync
+        # cannot keep the disease index from being rebuilt.
+        try:
+            _poll_patient_index()
+        except Exception as e:
+            with _lock:
+                _status["last_error"] = f"{_PATIENT_INDEX_JOB}: {e!r}"
+
+
+def _new_executor() -> ProcessPoolExecutor:
+    # "spawn" avoids forking a process that already holds threads and
+    # a loaded embedding model. One long-lived worker keeps its own
+    # embedding model warm between builds.
+    return ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def _restart_executor_if_broken() -> None:
+    global _executor, _executor_broken
+    with _lock:
+        if not _executor_broken or _executor is None:
+            return
+        old, _executor = _executor, _new_executor()
+        _executor_broken = False
+        _status["worker_restarts"] += 1
+    old.shutdown(wait=False, cancel_futures=True)
+
+
+def _watch_loop(interval: float) -> None:
+    while not _stop.is_set():
+        try:
+            _poll_once()
+        except Exception as e:
+            with _lock:
+                _status["last_error"] = f"watcher: {e}"
+        _stop.wait(interval)
+
+
+def start_background_indexer(interval: float = INDEX_WATCH_INTERVAL_SECONDS) -> None:
+    """Start the watcher thread and its single worker process (idempotent)."""
+    global _thread, _executor
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return
+        _stop.clear()
+        _executor = _new_executor()
+        _thread = threading.Thread(
+            target=_watch_loop, args=(interval,), name="index-watcher", daemon=True
+        )
+        _thread.start()
+    atexit.register(stop_background_indexer)
+
+
+def stop_background_indexer() -> None:
+    global _thread, _executor
+    _stop.set()
+    with _lock:
+        executor, _executor = _executor, None
+        _thread = None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def is_running() -> bool:
+    return _thread is not None and _thread.is_alive()
+
+
+def get_index(name: str, factory: Callable[[], Any], fingerprint: Hashable) -> Any:
+    """
+    Index lookup used by the tools. With the background indexer running,
+    any already-swapped-in index is served as-is (it may lag a file change
+    by one rebuild); otherwise, or before the first background build lands,
+    fall back to an inline cached build.
+    """
+    if is_running():
+        current = cache.peek(name, _MISSING)
+        if current is not _MISSING:
+            return current
+    return cache.get_or_create(name, factory, fingerprint=fingerprint)
+
+
+def indexer_status() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "running": is_running(),
+            "pending": sorted(_pending),
+            **_status,
+            "last_builds": dict(_status["last_builds"]),
+        }
@@ -1,13 +1,255 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from groq import APIConnectionError, APITimeoutError
+from langchain_core.runnables import RunnableLambda
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_groq import ChatGroq
-from .config import GROQ_API_KEY, EMBEDDING_MODEL_NAME, LLM_MODEL_NAME
+from .config import (
+    GROQ_API_KEY,
+    EMBEDDING_MODEL_NAME,
+    LLM_MODEL_NAME,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+)
+from . import cache
+
+# Lower value = served first. Waiting calls are admitted strictly in
+# (priority, arrival) order, so batch work never jumps ahead of a user.
+PRIORITIES = {"interactive": 0, "tool": 1, "evaluation": 2, "batch": 3}
+
+# Rough completion size used to reserve tokens before a call; corrected
+# from the provider's usage metadata once the call returns.
+_EXPECTED_COMPLETION_TOKENS = 256
+
+
+class _TokenBucket:
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (0 if available now)."""
+        self._refill(now)
+        need = min(amount, self.capacity)
+        return 0.0 if self.level >= need else (need - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        # May go negative when actual usage exceeds the reservation.
+        self.level -= amount
+
+
+def _estimate_tokens(value: Any) -> int:
+    text = value.to_string() if hasattr(value, "to_string") else str(value)
+    return len(text) // 4 + _EXPECTED_COMPLETION_TOKENS
+
+
+def _used_tokens(result: Any) -> Optional[int]:
+    # Plain AIMessage, or {"raw": AIMessage, ...} from include_raw structured output.
+    message = result.get("raw") if isinstance(result, dict) else result
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("total_tokens")
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def _is_retryable(error: Exception) -> bool:
+    # Same cases the Groq SDK retried before its own retries were turned off.
+    if isinstance(error, (APIConnectionError, APITimeoutError)):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    return "rate limit" in str(error).lower()
+
+
+class LLMScheduler:
+    """
+    Central gate for every LLM call in the process: token-bucket limits on
+    requests and tokens per minute, bounded concurrency, priority ordering,
+    and retry with jittered exponential backoff on connection errors,
+    timeouts and 408/409/429/5xx responses.
+    """
 
-def get_llm():
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_concurrency: int,
+        max_retries: int,
+    ) -> None:
+        self._cond = threading.Condition()
+        self._queue: list = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._requests = _TokenBucket(requests_per_minute)
+        self._tokens = _TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._metrics: Dict[str, Dict[str, Any]] = {
+            p: {"queued": 0, "calls": 0, "errors": 0, "wait_max": 0.0,
+                "waits": deque(maxlen=500)}
+            for p in PRIORITIES
+        }
+        self._retries = 0
+        self._rate_limited = 0
+
+    def _acquire(self, priority: str, tokens: int) -> None:
+        ticket = (PRIORITIES[priority], next(self._seq))
+        m = self._metrics[priority]
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            m["queued"] += 1
+            while True:
+                if self._queue[0] == ticket and self._active < self.max_concurrency:
+                    now = time.monotonic()
+                    delay = max(self._requests.delay(1, now), self._tokens.delay(tokens, now))
+                    if delay <= 0:
+                        break
+                    self._cond.wait(timeout=delay)
+                else:
+                    self._cond.wait()
+            heapq.heappop(self._queue)
+            self._active += 1
+            self._requests.take(1)
+            self._tokens.take(tokens)
+            m["queued"] -= 1
+            waited = time.monotonic() - started
+            m["wait_max"] = max(m["wait_max"], waited)
+            m["waits"].append(waited)
+            # The next ticket in line may be admissible too.
+            self._cond.notify_all()
+
+    def _release(self, reserved: int, used: Optional[int]) -> None:
+        with self._cond:
+            self._active -= 1
+            if used is not None:
+                self._tokens.take(used - reserved)
+            self._cond.notify_all()
+
+    def run(self, priority: str, fn: Callable[[Any], Any], value: Any) -> Any:
+        reserved = _estimate_tokens(value)
+        attempt = 0
+        while True:
+            self._acquire(priority, reserved)
+            try:
+                result = fn(value)
+            except Exception as e:
+                # A 429 was rejected before any tokens were consumed, so
+                # refund the reservation; other failures keep it.
+                self._release(reserved, 0 if _status_code(e) == 429 else None)
+                retryable = _is_retryable(e)
+                with self._cond:
+                    if retryable:
+                        self._rate_limited += 1
+                    if not retryable or attempt >= self.max_retries:
+                        self._metrics[priority]["errors"] += 1
+                        raise
+                    self._retries += 1
+                attempt += 1
+                backoff = min(30.0, 2.0 ** attempt)
+                time.sleep(_retry_after(e) or random.uniform(0.5, 1.0) * backoff)
+                continue
+            self._release(reserved, _used_tokens(result))
+            with self._cond:
+                self._metrics[priority]["calls"] += 1
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            per_priority = {}
+            for p, m in self._metrics.items():
+                waits = sorted(m["waits"])
+                per_priority[p] = {
+                    "queued": m["queued"],
+                    "calls": m["calls"],
+                    "errors": m["errors"],
+                    "avg_wait_s": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                    "p95_wait_s": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+                    "max_wait_s": round(m["wait_max"], 3),
+                }
+            return {
+                "active": self._active,
+                "queue_depth": len(self._queue),
+                "retries": self._retries,
+                "rate_limited": self._rate_limited,
+                "priorities": per_priority,
+            }
+
+
+_scheduler = LLMScheduler(
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    max_retries=LLM_MAX_RETRIES,
+)
+
+
+def _create_llm():
     return ChatGroq(
         api_key=GROQ_API_KEY,
         model_name=LLM_MODEL_NAME,
-        temperature=0.2
+        temperature=0.2,
+        # Retries are owned by the scheduler so they respect priorities.
+        max_retries=0,
     )
 
+
+def get_chat_model():
+    """The shared ChatGroq client. Call it through `schedule`/`get_llm`."""
+    return cache.get_or_create("llm", _create_llm, fingerprint=LLM_MODEL_NAME)
+
+
+def schedule(runnable, priority: str):
+    """Wrap any runnable built on the chat model so it goes through the scheduler."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority '{priority}'. Use one of {list(PRIORITIES)}.")
+
+    def _invoke(value):
+        return _scheduler.run(priority, runnable.invoke, value)
+
+    return RunnableLambda(_invoke, name=f"scheduled_llm_{priority}")
+
+
+def get_llm(priority: str = "interactive"):
+    return schedule(get_chat_model(), priority)
+
+
+def llm_scheduler_stats() -> Dict[str, Any]:
+    return _scheduler.stats()
+
+
 def get_embeddings():
-    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+    return cache.get_or_create(
+        "embeddings",
+        lambda: HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME),
+        fingerprint=EMBEDDING_MODEL_NAME,
+    )
@@ -77,6 +77,73 @@ def add_patient_note(
     _save_json(NOTES_FILE, data)
 
 
+def _as_text(value: Any) -> str:
+    # Older notes store conditions/medications as lists.
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)
+    return str(value or "")
+
+
+def _content_key(key: str, entry: Dict[str, Any]) -> tuple:
+    return (
+        key,
+        entry.get("note"),
+        _as_text(entry.get("conditions")),
+        _as_text(entry.get("medications")),
+    )
+
+
+def add_patient_notes(entries: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Append many notes with a single read and a single write of the notes
+    file. Each entry needs patient_name and note; timestamp, conditions and
+    medications are optional. An entry with a timestamp is skipped if the
+    same patient already has that note at that timestamp; one without is
+    skipped if the patient already has the same note, conditions and
+    medications, and is otherwise stamped with the current time.
+    """
+    data = _load_json(NOTES_FILE)
+    seen_timed = {
+        (key, e.get("timestamp"), e.get("note"))
+        for key, items in data.items()
+        for e in items
+    }
+    seen_content = {
+        _content_key(key, e)
+        for key, items in data.items()
+        for e in items
+    }
+    now = dt.datetime.now().isoformat(timespec="seconds")
+    inserted = 0
+    duplicates = 0
+    for entry in entries:
+        key = entry["patient_name"].lower().strip()
+        timestamp = entry.get("timestamp")
+        content = _content_key(key, entry)
+        if timestamp:
+            duplicate = (key, timestamp, entry["note"]) in seen_timed
+        else:
+            duplicate = content in seen_content
+            timestamp = now
+        if duplicate:
+            duplicates += 1
+            continue
+        seen_timed.add((key, timestamp, entry["note"]))
+        seen_content.add(content)
+        data.setdefault(key, []).append(
+            {
+                "timestamp": timestamp,
+                "note": entry["note"],
+                "conditions": entry.get("conditions", ""),
+                "medications": entry.get("medications", ""),
+            }
+        )
+        inserted += 1
+    if inserted:
+        _save_json(NOTES_FILE, data)
+    return {"inserted": inserted, "duplicates": duplicates}
+
+
 def get_patient_notes(patient_name: str, max_entries: int = 10) -> str:
     data = _load_json(NOTES_FILE)
     key = patient_name.lower().strip()
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+from typing import Any, Dict, List, Optional
+
+from .agent import _plan_from_query
+
+# Compare the structured (function-calling) planner with the free-text
+# prompt planner on latency, token usage, fallbacks and routing agreement.
+
+SAMPLE_QUERIES = [
+    "My 70-year-old father has chronic kidney disease. Please book a nephrologist for him tomorrow.",
+    "Summarize the medical history for Anjali Mehra.",
+    "What are the latest treatments for Type 2 Diabetes?",
+    "Update history for Anjali Mehra: she is now taking amlodipine and has hypertension.",
+    "Book a cardiologist for David Thompson on 2025-12-05, he has chest pain.",
+    "What are the warning signs of a stroke?",
+    "Give me Ramesh Kulkarni's recent encounters and medications.",
+    "Add a note for Rebecca Nagle: allergic to penicillin.",
+]
+
+
+def _summary(values: List[Optional[float]]) -> Dict[str, Optional[float]]:
+    nums = [v for v in values if v is not None]
+    if not nums:
+        return {"mean": None, "p50": None, "max": None}
+    return {
+        "mean": round(statistics.mean(nums), 1),
+        "p50": round(statistics.median(nums), 1),
+        "max": round(max(nums), 1),
+    }
+
+
+def run_benchmark(queries: List[str] = SAMPLE_QUERIES, repeats: int = 1) -> Dict[str, Any]:
+    runs: Dict[str, List[Dict[str, Any]]] = {"prompt": [], "structured": []}
+    task_types: Dict[str, List[Optional[str]]] = {"prompt": [], "structured": []}
+
+    for _ in range(repeats):
+        for query in queries:
+            for mode in runs:
+                plan, stats = _plan_from_query(query, mode=mode)
+                runs[mode].append(stats)
+                task_types[mode].append(plan.get("task_type"))
+
+    report: Dict[str, Any] = {"queries": len(queries), "repeats": repeats}
+    for mode, stats in runs.items():
+        report[mode] = {
+            "latency_ms": _summary([s["latency_ms"] for s in stats]),
+            "prompt_tokens": _summary([s.get("prompt_tokens") for s in stats]),
+            "completion_tokens": _summary([s.get("completion_tokens") for s in stats]),
+            "fallbacks": sum(1 for s in stats if s["fallback"]),
+        }
+    agree = sum(a == b for a, b in zip(task_types["prompt"], task_types["structured"]))
+    report["task_type_agreement"] = round(agree / len(task_types["prompt"]), 3)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark planner modes.")
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(repeats=args.repeats), indent=2))
@@ -4,9 +4,21 @@ import pandas as pd
 from typing import List, Dict, Any, Optional
 
 from ..config import APPOINTMENT_FILE
+from .. import cache
 
 
 def _load_appointments() -> pd.DataFrame:
+    # Parsed sheet is shared across sessions; callers get their own copy
+    # because booking mutates the frame before saving.
+    df = cache.get_or_create(
+        "appointments",
+        _read_appointments,
+        fingerprint=cache.path_fingerprint(APPOINTMENT_FILE),
+    )
+    return df.copy()
+
+
+def _read_appointments() -> pd.DataFrame:
     if not APPOINTMENT_FILE.exists():
         df = pd.DataFrame(
             columns=[
@@ -27,6 +39,7 @@ def _load_appointments() -> pd.DataFrame:
 
 def _save_appointments(df: pd.DataFrame) -> None:
     df.to_excel(APPOINTMENT_FILE, index=False)
+    cache.invalidate("appointments")
 
 
 def list_available_slots(
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+from typing import Any, Dict, IO, Optional, Union
+
+import pandas as pd
+
+from .appointments import _load_appointments, _save_appointments
+from ..memory import add_patient_notes
+
+Source = Union[str, Path, IO]
+
+SLOT_KEY_COLUMNS = ["doctor_name", "speciality", "date", "time_slot"]
+NOTE_COLUMNS = ["patient_name", "note", "conditions", "medications", "timestamp"]
+
+
+def _read_table(source: Source, fmt: Optional[str] = None) -> pd.DataFrame:
+    """
+    Read a CSV / Excel / JSONL batch. `fmt` is the file suffix; it is taken
+    from the path (or the upload's .name) when not given.
+    """
+    if fmt is None:
+        fmt = Path(getattr(source, "name", str(source))).suffix
+    fmt = fmt.lower().lstrip(".")
+
+    if fmt == "csv":
+        df = pd.read_csv(source, dtype=str, keep_default_na=False)
+    elif fmt in ("xlsx", "xls"):
+        df = pd.read_excel(source, dtype=str, keep_default_na=False)
+    elif fmt in ("jsonl", "json"):
+        df = pd.read_json(source, lines=(fmt == "jsonl"), dtype=False)
+    else:
+        raise ValueError(f"Unsupported import format '{fmt}'. Use csv, xlsx or jsonl.")
+
+    df.columns = [str(c).strip().lower().replace(" ", "_") for c in df.columns]
+    return df
+
+
+def _text(series: pd.Series) -> pd.Series:
+    return series.fillna("").astype(str).str.strip()
+
+
+def _report(rows_read: int, inserted: int, duplicates: int, invalid: int, started: float) -> Dict[str, Any]:
+    seconds = time.perf_counter() - started
+    return {
+        "rows_read": rows_read,
+        "inserted": inserted,
+        "duplicates": duplicates,
+        "invalid": invalid,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows_read / seconds, 1) if seconds > 0 else None,
+    }
+
+
+def import_appointment_slots(source: Source, fmt: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Bulk-load appointment slots into records.xlsx.
+
+    Required columns: doctor_name, speciality, date, time_slot. Optional:
+    status (default "available"), patient_name. Specialities are lower-cased,
+    dates normalised to YYYY-MM-DD; rows with an unparseable date or empty
+    key field are rejected, and slots already present (same doctor,
+    speciality, date and time) are skipped. The sheet is written once.
+    """
+    started = time.perf_counter()
+    df = _read_table(source, fmt)
+    rows_read = len(df)
+
+    missing = [c for c in SLOT_KEY_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Slot import is missing required columns: {', '.join(missing)}")
+
+    batch = pd.DataFrame(
+        {
+            "patient_name": _text(df["patient_name"]) if "patient_name" in df.columns else "",
+            "doctor_name": _text(df["doctor_name"]),
+            "speciality": _text(df["speciality"]).str.lower(),
+            "date": pd.to_datetime(df["date"], errors="coerce").dt.strftime("%Y-%m-%d"),
+            "time_slot": _text(df["time_slot"]),
+            "status": _text(df["status"]).str.lower() if "status" in df.columns else "available",
+        }
+    )
+    batch["status"] = batch["status"].replace("", "available")
+
+    valid = batch["date"].notna()
+    for col in ("doctor_name", "speciality", "time_slot"):
+        valid &= batch[col] != ""
+    invalid = int((~valid).sum())
+    batch = batch[valid]
+
+    before = len(batch)
+    batch = batch.drop_duplicates(subset=SLOT_KEY_COLUMNS)
+
+    existing = _load_appointments()
+    if "date" in existing.columns:
+        # Excel date cells load as datetimes; store every date in the same
+        # YYYY-MM-DD string form as the batch so the combined column does
+        # not end up as mixed objects ("2025-12-05 00:00:00" after astype(str)).
+        parsed = pd.to_datetime(existing["date"], errors="coerce").dt.strftime("%Y-%m-%d")
+        existing = existing.assign(date=parsed.fillna(existing["date"]))
+    if not existing.empty and set(SLOT_KEY_COLUMNS) <= set(existing.columns):
+        existing_keys = pd.DataFrame(
+            {
+                "doctor_name": _text(existing["doctor_name"]),
+                "speciality": _text(existing["speciality"]).str.lower(),
+                "date": existing["date"],
+                "time_slot": _text(existing["time_slot"]),
+            }
+        ).drop_duplicates()
+        merged = batch.merge(existing_keys, on=SLOT_KEY_COLUMNS, how="left", indicator=True)
+        batch = batch[(merged["_merge"] == "left_only").to_numpy()]
+    duplicates = before - len(batch)
+
+    if not batch.empty:
+        start_id = 0
+        if "appointment_id" in existing.columns and not existing.empty:
+            ids = pd.to_numeric(existing["appointment_id"], errors="coerce")
+            start_id = int(ids.fillna(0).max())
+        batch = batch.assign(appointment_id=range(start_id + 1, start_id + 1 + len(batch)))
+        _save_appointments(pd.concat([existing, batch], ignore_index=True))
+
+    return _report(rows_read, len(batch), duplicates, invalid, started)
+
+
+def import_patient_notes(source: Source, fmt: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Bulk-load historical patient notes into patient_notes.json.
+
+    Required columns: patient_name, note. Optional: conditions, medications,
+    timestamp (parsed and stored as ISO seconds; defaults to now). Rows with
+    a timestamp are skipped when the patient already has the same note at
+    that timestamp; rows without one are skipped when the patient already
+    has the same note, conditions and medications. The notes file is
+    written once.
+    """
+    started = time.perf_counter()
+    df = _read_table(source, fmt)
+    rows_read = len(df)
+
+    missing = [c for c in ("patient_name", "note") if c not in df.columns]
+    if missing:
+        raise ValueError(f"Notes import is missing required columns: {', '.join(missing)}")
+
+    batch = pd.DataFrame(
+        {
+            "patient_name": _text(df["patient_name"]),
+            "note": _text(df["note"]),
+            "conditions": _text(df["conditions"]) if "conditions" in df.columns else "",
+            "medications": _text(df["medications"]) if "medications" in df.columns else "",
+            "timestamp": (
+                pd.to_datetime(df["timestamp"], errors="coerce").dt.strftime("%Y-%m-%dT%H:%M:%S")
+                if "timestamp" in df.columns
+                else None
+            ),
+        }
+    )
+    # Missing/unparseable timestamps stay None: add_patient_notes then
+    # dedupes on content and stamps the current time.
+    batch["timestamp"] = batch["timestamp"].astype(object).where(batch["timestamp"].notna(), None)
+
+    valid = (batch["patient_name"] != "") & (batch["note"] != "")
+    invalid = int((~valid).sum())
+    batch = batch[valid]
+
+    result = add_patient_notes(batch[NOTE_COLUMNS].to_dict(orient="records"))
+    return _report(rows_read, result["inserted"], result["duplicates"], invalid, started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import slots or patient notes.")
+    parser.add_argument("kind", choices=["slots", "notes"])
+    parser.add_argument("path", type=Path)
+    args = parser.parse_args()
+
+    importer = import_appointment_slots if args.kind == "slots" else import_patient_notes
+    print(importer(args.path))
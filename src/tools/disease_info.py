@@ -11,8 +11,9 @@ from langchain_core.output_parsers import StrOutputParser
 
 from ..llm import get_llm, get_embeddings
 from ..config import DISEASES_DIR
-
-_vectorstore: Optional[FAISS] = None
+from ..singleflight import single_flight
+from .. import cache
+from ..indexing import get_index
 
 
 def _load_disease_docs():
@@ -31,10 +32,16 @@ def _load_disease_docs():
 
 
 def _get_or_build_vectorstore() -> Optional[FAISS]:
-    global _vectorstore
-    if _vectorstore is not None:
-        return _vectorstore
+    # Rebuilt automatically when any file under DISEASES_DIR changes.
+    return get_index(
+        "disease_index",
+        _build_vectorstore,
+        fingerprint=cache.path_fingerprint(DISEASES_DIR),
+    )
+
 
+@single_flight("disease_index_build", key=lambda: "diseases")
+def _build_vectorstore() -> Optional[FAISS]:
     docs = _load_disease_docs()
     if not docs:
         return None
@@ -45,17 +52,20 @@ def _get_or_build_vectorstore() -> Optional[FAISS]:
     )
     chunks = splitter.split_documents(docs)
     embeddings = get_embeddings()
-    _vectorstore = FAISS.from_documents(chunks, embeddings)
-    return _vectorstore
+    return FAISS.from_documents(chunks, embeddings)
 
 
+@single_flight(
+    "disease_information",
+    key=lambda disease_query: " ".join(disease_query.lower().split()),
+)
 def get_disease_information(disease_query: str) -> str:
     """
     Provide disease/condition information using:
     - Local WHO/Medline docs in data/diseases (RAG)
     - Fallback to LLM-only explanation if no docs.
     """
-    llm = get_llm()
+    llm = get_llm(priority="tool")
     vs = _get_or_build_vectorstore()
 
     if vs is None:
@@ -1,17 +1,23 @@
 from __future__ import annotations
 
+import time
 from pathlib import Path
-from typing import List, Dict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.vectorstores import FAISS
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
 from ..llm import get_llm, get_embeddings
-from ..config import PATIENTS_DIR
+from ..config import PATIENTS_DIR, GLOBAL_PATIENT_INDEX, INDEX_EMBED_BATCH_SIZE
 from ..memory import get_patient_context, get_patient_notes, save_patient_summary
+from ..singleflight import single_flight
+from .. import cache
+from ..indexing import get_index
+from . import patient_index
 
 
 # Map patient names to the PDF files you have
@@ -23,43 +29,130 @@ PATIENT_FILES: Dict[str, List[str]] = {
 }
 
 
-def _load_patient_docs(patient_name: str):
-    """
-    Load one or more PDF files mapped to a patient.
-    """
+def _patient_pdf_paths(patient_name: str) -> List[Path]:
     key = patient_name.lower().strip()
     if key not in PATIENT_FILES:
         raise ValueError(
             f"No documents configured for patient '{patient_name}'. "
             "Update PATIENT_FILES in medical_records.py."
         )
+    return [PATIENTS_DIR / fname for fname in PATIENT_FILES[key]]
 
-    docs = []
-    for fname in PATIENT_FILES[key]:
-        pdf_path = PATIENTS_DIR / fname
+
+def _iter_patient_pages(patient_name: str) -> Iterator[Document]:
+    """
+    Lazily yield the pages of the PDF files mapped to a patient, one page
+    in memory at a time.
+    """
+    pdf_paths = _patient_pdf_paths(patient_name)
+    for pdf_path in pdf_paths:
         if not pdf_path.exists():
             raise FileNotFoundError(f"Patient PDF not found: {pdf_path}")
-        loader = PyPDFLoader(str(pdf_path))
-        docs.extend(loader.load())
-
-    return docs
+    for pdf_path in pdf_paths:
+        yield from PyPDFLoader(str(pdf_path)).lazy_load()
 
 
-def _build_vectorstore(docs):
-    """
-    Build vector search index (FAISS) from PDF chunks.
-    """
+def _iter_chunks(pages: Iterable[Document]) -> Iterator[Document]:
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=1000,
         chunk_overlap=200,
     )
-    chunks = splitter.split_documents(docs)
+    for page in pages:
+        yield from splitter.split_documents([page])
+
+
+def _batched(items: Iterable[Document], size: int) -> Iterator[List[Document]]:
+    batch: List[Document] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 
+# Last inline build per patient: chunks, batch size, seconds, and the
+# process RSS before the build and at its highest sampled point (after each
+# embedded batch). Other work in the process shows up in these too.
+_build_stats: Dict[str, Dict[str, Any]] = {}
+
+
+def _build_vectorstore(
+    chunks: Iterable[Document],
+    batch_size: int = INDEX_EMBED_BATCH_SIZE,
+    on_batch: Optional[Callable[[], None]] = None,
+):
+    """
+    Build vector search index (FAISS) from PDF chunks, embedding and adding
+    `batch_size` chunks at a time so peak memory does not grow with the
+    size of the record. `on_batch` is called after each batch is added.
+    """
     embeddings = get_embeddings()
-    vs = FAISS.from_documents(chunks, embeddings)
+    vs = None
+    for batch in _batched(chunks, batch_size):
+        if vs is None:
+            vs = FAISS.from_documents(batch, embeddings)
+        else:
+            vs.add_documents(batch)
+        if on_batch is not None:
+            on_batch()
+    return vs
+
+
+@single_flight("patient_index_build", key=lambda patient_name: patient_name.lower().strip())
+def _build_patient_vectorstore(patient_name: str):
+    """
+    Stream a patient's PDFs into an index. Concurrent builds for the
+    same patient share one execution.
+    """
+    started = time.perf_counter()
+    rss_before = cache.process_rss_mb()
+    rss_peak = rss_before
+
+    def _sample_rss() -> None:
+        nonlocal rss_peak
+        rss = cache.process_rss_mb()
+        if rss is not None and (rss_peak is None or rss > rss_peak):
+            rss_peak = rss
+
+    vs = _build_vectorstore(
+        _iter_chunks(_iter_patient_pages(patient_name)), on_batch=_sample_rss
+    )
+    if vs is None:
+        raise ValueError(f"No text could be extracted from the documents of '{patient_name}'.")
+    _build_stats[patient_name.lower().strip()] = {
+        "chunks": int(vs.index.ntotal),
+        "batch_size": INDEX_EMBED_BATCH_SIZE,
+        "seconds": round(time.perf_counter() - started, 2),
+        "rss_before_mb": rss_before,
+        "rss_peak_mb": rss_peak,
+        "rss_growth_mb": (
+            round(rss_peak - rss_before, 1) if rss_before is not None else None
+        ),
+    }
     return vs
 
 
+def index_build_stats() -> Dict[str, Dict[str, Any]]:
+    return dict(_build_stats)
+
+
+def _get_patient_vectorstore(patient_name: str):
+    """
+    Cached per-patient index, rebuilt when the patient's PDFs change.
+    """
+    return get_index(
+        f"patient_index:{patient_name.lower().strip()}",
+        lambda: _build_patient_vectorstore(patient_name),
+        fingerprint=cache.path_fingerprint(*_patient_pdf_paths(patient_name)),
+    )
+
+
+@single_flight(
+    "patient_summary",
+    key=lambda patient_name, question=None: (patient_name.lower().strip(), question),
+)
 def summarize_patient_history(patient_name: str, question: str | None = None) -> str:
     """
     Summarize patient medical history, combining:
@@ -67,9 +160,7 @@ def summarize_patient_history(patient_name: str, question: str | None = None) ->
     - Stored memory summaries
     - Manually added notes
     """
-    llm = get_llm()
-    docs = _load_patient_docs(patient_name)
-    vs = _build_vectorstore(docs)
+    llm = get_llm(priority="tool")
 
     if question is None:
         question = (
@@ -77,8 +168,12 @@ def summarize_patient_history(patient_name: str, question: str | None = None) ->
             "key diagnoses, treatments, medications, and recent encounters."
         )
 
-    retriever = vs.as_retriever(search_kwargs={"k": 4})
-    relevant_docs = retriever.invoke(question)
+    if GLOBAL_PATIENT_INDEX:
+        relevant_docs = patient_index.search_patient(patient_name, question, k=4)
+    else:
+        vs = _get_patient_vectorstore(patient_name)
+        retriever = vs.as_retriever(search_kwargs={"k": 4})
+        relevant_docs = retriever.invoke(question)
 
     ehr_context = "\n\n".join(d.page_content for d in relevant_docs)
 
@@ -0,0 +1,375 @@
+from __future__ import annotations
+
+import copy
+import json
+import os
+import pickle
+import shutil
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from ..llm import get_embeddings
+from ..config import INDEX_EMBED_BATCH_SIZE, PATIENT_INDEX_DIR
+from .. import cache
+
+# One persistent vector index over every patient's documents, stored as
+# append-only shards.
+#
+# A shard is a flat FAISS index plus the chunk documents for one update
+# batch. Each patient's chunks sit in one contiguous row range of one shard,
+# recorded in the manifest, so a query is restricted to that patient with a
+# FAISS range selector. Updating patients writes one new shard holding only
+# their chunks and repoints their manifest entries; rows left behind in older
+# shards are dead and are reclaimed by compaction once they outnumber live
+# rows. Readers keep using the manifest they started with until the new one
+# is swapped in. The background indexer embeds changed patients in its
+# worker process (embed_patients) and stores the result here
+# (apply_embedded).
+#
+# Shard vectors are memory-mapped when the installed faiss can map flat
+# indexes (IO_FLAG_MMAP_IFC); otherwise an opened shard is read into RAM.
+# Chunk text is always loaded into RAM per opened shard.
+
+SHARDS_DIR = PATIENT_INDEX_DIR / "shards"
+MANIFEST_FILE = PATIENT_INDEX_DIR / "manifest.json"
+
+_MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+
+_write_lock = threading.RLock()
+_shards_lock = threading.Lock()
+# {"shards": {id: {"rows": n}}, "patients": {key: {...}}, "next_shard": n};
+# replaced as a whole, never mutated in place.
+_manifest: Optional[Dict[str, Any]] = None
+# shard id -> (faiss index, list of chunk Documents)
+_open_shards: Dict[str, Tuple[Any, list]] = {}
+
+
+def _empty_manifest() -> Dict[str, Any]:
+    return {"shards": {}, "patients": {}, "next_shard": 1}
+
+
+def _get_manifest() -> Dict[str, Any]:
+    global _manifest
+    if _manifest is None:
+        with _write_lock:
+            if _manifest is None:
+                data = {}
+                if MANIFEST_FILE.exists():
+                    with MANIFEST_FILE.open("r", encoding="utf-8") as f:
+                        data = json.load(f)
+                _manifest = data if "patients" in data else _empty_manifest()
+    return _manifest
+
+
+def _open_shard(shard_id: str) -> Tuple[Any, list]:
+    with _shards_lock:
+        shard = _open_shards.get(shard_id)
+        if shard is None:
+            path = SHARDS_DIR / shard_id
+            if _MMAP_FLAG is not None:
+                index = faiss.read_index(str(path / "vectors.faiss"), _MMAP_FLAG)
+            else:
+                index = faiss.read_index(str(path / "vectors.faiss"))
+            # Written by _write_shard below, never from user input.
+            with (path / "docs.pkl").open("rb") as f:
+                docs = pickle.load(f)
+            shard = (index, docs)
+            # Don't keep a shard that a concurrent _commit just dropped.
+            if shard_id in _get_manifest()["shards"]:
+                _open_shards[shard_id] = shard
+        return shard
+
+
+def _write_shard(shard_id: str, index: Any, docs: list) -> None:
+    tmp = SHARDS_DIR / f"{shard_id}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    faiss.write_index(index, str(tmp / "vectors.faiss"))
+    with (tmp / "docs.pkl").open("wb") as f:
+        pickle.dump(docs, f)
+    # shard_id is the manifest's next_shard, so nothing references it yet;
+    # a directory already there was left by a crash before _commit, and
+    # os.replace cannot overwrite a non-empty directory.
+    shutil.rmtree(SHARDS_DIR / shard_id, ignore_errors=True)
+    os.replace(tmp, SHARDS_DIR / shard_id)
+
+
+def _commit(manifest: Dict[str, Any]) -> None:
+    """Write the manifest, swap it in, and delete shards it no longer uses."""
+    global _manifest
+    live = {e["shard"] for e in manifest["patients"].values() if e["shard"]}
+    dropped = [s for s in manifest["shards"] if s not in live]
+    for shard_id in dropped:
+        del manifest["shards"][shard_id]
+
+    PATIENT_INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = MANIFEST_FILE.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, MANIFEST_FILE)
+    _manifest = manifest
+
+    with _shards_lock:
+        for shard_id in dropped:
+            _open_shards.pop(shard_id, None)
+    for shard_id in dropped:
+        # Searches still holding an open (mapped) shard keep working on Linux.
+        shutil.rmtree(SHARDS_DIR / shard_id, ignore_errors=True)
+
+
+def _fingerprint(patient_name: str):
+    from .medical_records import _patient_pdf_paths
+
+    # JSON round-trip so it compares equal to what the manifest stores.
+    return json.loads(json.dumps(cache.path_fingerprint(*_patient_pdf_paths(patient_name))))
+
+
+def _embed_patient(key: str, chunks: Iterable) -> Tuple[Optional[np.ndarray], list]:
+    from .medical_records import _batched
+
+    embeddings = get_embeddings()
+    vectors: List[np.ndarray] = []
+    docs: list = []
+    for batch in _batched(chunks, INDEX_EMBED_BATCH_SIZE):
+        for chunk in batch:
+            chunk.metadata["patient_id"] = key
+        vectors.append(
+            np.asarray(embeddings.embed_documents([c.page_content for c in batch]), dtype="float32")
+        )
+        docs.extend(batch)
+    return (np.vstack(vectors) if vectors else None), docs
+
+
+def _apply(
+    embedded: Dict[str, Tuple[Optional[np.ndarray], list, Any]],
+    deletes: List[str],
+) -> None:
+    """
+    Write every patient in `embedded` ({key: (vectors, docs, fingerprint)})
+    into one new shard and drop `deletes`, with a single manifest swap.
+    Cost is proportional to the changed patients, not to the whole index.
+    Caller holds _write_lock.
+    """
+    manifest = copy.deepcopy(_get_manifest())
+    shard_id = f"{manifest['next_shard']:06d}"
+    index = None
+    docs: list = []
+
+    for key, (vectors, patient_docs, fingerprint) in embedded.items():
+        start = len(docs)
+        if patient_docs:
+            if index is None:
+                index = faiss.IndexFlatL2(vectors.shape[1])
+            index.add(vectors)
+            docs.extend(patient_docs)
+        manifest["patients"][key] = {
+            "fingerprint": fingerprint,
+            "shard": shard_id if patient_docs else None,
+            "start": start,
+            "end": len(docs),
+        }
+
+    for key in deletes:
+        manifest["patients"].pop(key, None)
+
+    if index is not None:
+        _write_shard(shard_id, index, docs)
+        manifest["shards"][shard_id] = {"rows": len(docs)}
+        manifest["next_shard"] += 1
+    _commit(manifest)
+
+
+def _compact_if_needed() -> bool:
+    """
+    Rewrite all live rows into one shard once dead rows (left behind by
+    updates) outnumber live ones. Vectors are copied, not re-embedded.
+    Caller holds _write_lock.
+    """
+    manifest = copy.deepcopy(_get_manifest())
+    total = sum(s["rows"] for s in manifest["shards"].values())
+    live = sum(e["end"] - e["start"] for e in manifest["patients"].values())
+    if total - live <= max(live, 1000):
+        return False
+
+    shard_id = f"{manifest['next_shard']:06d}"
+    index = None
+    docs: list = []
+    for entry in manifest["patients"].values():
+        if not entry["shard"]:
+            continue
+        shard_index, shard_docs = _open_shard(entry["shard"])
+        count = entry["end"] - entry["start"]
+        vectors = shard_index.reconstruct_n(entry["start"], count)
+        if index is None:
+            index = faiss.IndexFlatL2(vectors.shape[1])
+        start = len(docs)
+        index.add(vectors)
+        docs.extend(shard_docs[entry["start"] : entry["end"]])
+        entry.update({"shard": shard_id, "start": start, "end": len(docs)})
+
+    if index is not None:
+        _write_shard(shard_id, index, docs)
+        manifest["shards"][shard_id] = {"rows": len(docs)}
+        manifest["next_shard"] += 1
+    _commit(manifest)
+    return True
+
+
+def sync_patient(patient_name: str) -> bool:
+    """
+    Re-index one patient in this process if their PDFs changed since the
+    last sync. Returns True when the index was updated.
+    """
+    from .medical_records import _iter_chunks, _iter_patient_pages
+
+    key = patient_name.lower().strip()
+    fingerprint = _fingerprint(patient_name)
+    if _get_manifest()["patients"].get(key, {}).get("fingerprint") == fingerprint:
+        return False
+
+    with _write_lock:
+        if _get_manifest()["patients"].get(key, {}).get("fingerprint") == fingerprint:
+            return False
+        vectors, docs = _embed_patient(key, _iter_chunks(_iter_patient_pages(patient_name)))
+        _apply({key: (vectors, docs, fingerprint)}, [])
+    return True
+
+
+def pending_changes() -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Patients whose PDFs changed since they were indexed, as {key:
+    fingerprint}, and indexed keys no longer in PATIENT_FILES.
+    """
+    from .medical_records import PATIENT_FILES
+
+    patients = _get_manifest()["patients"]
+    changed = {}
+    for patient in PATIENT_FILES:
+        fingerprint = _fingerprint(patient)
+        if patients.get(patient, {}).get("fingerprint") != fingerprint:
+            changed[patient] = fingerprint
+    removed = [key for key in patients if key not in PATIENT_FILES]
+    return changed, removed
+
+
+def embed_patients(patients: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Parse and embed each patient's PDFs; the background indexer runs this
+    in its worker process. A patient that fails is reported with its error
+    ({"error": ...}) instead of aborting the others; the rest come back as
+    {"vectors": ..., "docs": ...}.
+    """
+    from .medical_records import _iter_chunks, _iter_patient_pages
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for patient in patients:
+        key = patient.lower().strip()
+        try:
+            vectors, docs = _embed_patient(key, _iter_chunks(_iter_patient_pages(patient)))
+        except Exception as e:
+            results[key] = {"error": repr(e)}
+        else:
+            results[key] = {"vectors": vectors, "docs": docs}
+    return results
+
+
+def apply_embedded(
+    results: Dict[str, Dict[str, Any]],
+    fingerprints: Dict[str, Any],
+    removed: List[str],
+) -> Dict[str, str]:
+    """
+    Store the output of embed_patients in one new shard (each patient under
+    the fingerprint it was embedded from), drop `removed`, then compact
+    dead rows if needed. Returns {key: error} for patients left unchanged.
+    """
+    failed: Dict[str, str] = {}
+    embedded = {}
+    for key, fingerprint in fingerprints.items():
+        result = results.get(key) or {"error": "no result from worker"}
+        if "error" in result:
+            failed[key] = result["error"]
+        else:
+            embedded[key] = (result["vectors"], result["docs"], fingerprint)
+
+    with _write_lock:
+        if embedded or removed:
+            _apply(embedded, removed)
+        _compact_if_needed()
+    return failed
+
+
+def sync_all() -> Dict[str, int]:
+    """
+    Bring the index in line with PATIENT_FILES in this process, in one
+    batch. The background indexer does the same with the embedding step
+    in its worker process.
+    """
+    with _write_lock:
+        changed, removed = pending_changes()
+        failed = apply_embedded(embed_patients(list(changed)), changed, removed)
+    return {
+        "updated": len(changed) - len(failed),
+        "failed": len(failed),
+        "removed": len(removed),
+    }
+
+
+def search_patient(patient_name: str, question: str, k: int = 4) -> list:
+    """
+    Top-k chunks for `question`, restricted to this patient's documents.
+
+    Serves whatever is currently indexed; with the background indexer
+    running, changed PDFs are picked up by it. A patient who is
+    not indexed yet (or any change while the indexer is off) is synced
+    inline.
+    """
+    from ..indexing import is_running
+
+    key = patient_name.lower().strip()
+    entry = _get_manifest()["patients"].get(key)
+    if entry is None or not is_running():
+        sync_patient(patient_name)
+        entry = _get_manifest()["patients"].get(key)
+    if entry is None or not entry["shard"]:
+        return []
+
+    try:
+        index, docs = _open_shard(entry["shard"])
+    except (OSError, RuntimeError):
+        # The shard was dropped by an update or compaction after `entry`
+        # was read; _commit swaps the manifest before deleting, so the
+        # current one points at the new location.
+        entry = _get_manifest()["patients"].get(key)
+        if entry is None or not entry["shard"]:
+            return []
+        index, docs = _open_shard(entry["shard"])
+    start, end = entry["start"], entry["end"]
+    query = np.asarray([get_embeddings().embed_query(question)], dtype="float32")
+    try:
+        params = faiss.SearchParameters(sel=faiss.IDSelectorRange(start, end))
+        _, found = index.search(query, min(k, end - start), params=params)
+        rows = [int(r) for r in found[0] if r != -1]
+    except (AttributeError, TypeError):
+        # faiss without search-time selectors: exact scan of this
+        # patient's rows only.
+        vectors = index.reconstruct_n(start, end - start)
+        distances = ((vectors - query) ** 2).sum(axis=1)
+        rows = [start + int(i) for i in np.argsort(distances)[:k]]
+    return [docs[r] for r in rows]
+
+
+def index_stats() -> Dict[str, Any]:
+    manifest = _get_manifest()
+    total = sum(s["rows"] for s in manifest["shards"].values())
+    live = sum(e["end"] - e["start"] for e in manifest["patients"].values())
+    return {
+        "patients": len(manifest["patients"]),
+        "shards": len(manifest["shards"]),
+        "live_vectors": live,
+        "dead_vectors": total - live,
+        "vectors_memory_mapped": _MMAP_FLAG is not None,
+    }
@@ -2,13 +2,32 @@ import streamlit as st
 
 from src.agent import run_agent
 from src.tools.appointments import list_available_slots
+from src.tools.bulk_import import import_appointment_slots, import_patient_notes
+from src.tools.patient_index import index_stats as patient_index_stats
+from src.tools.medical_records import index_build_stats as patient_index_build_stats
 from src.evaluation import log_interaction, evaluate_answer
 from src.memory import get_patient_context, get_patient_notes
+from src.singleflight import get_single_flight_stats
+from src.llm import llm_scheduler_stats
+from src import cache as resource_cache
+from src.config import BACKGROUND_INDEXING, GLOBAL_PATIENT_INDEX
+from src.indexing import start_background_indexer, indexer_status
 
 st.set_page_config(page_title="Agentic Healthcare Assistant", layout="wide")
 
 st.title("🩺 Agentic Healthcare Assistant")
 
+
+@st.cache_resource
+def _start_indexer() -> bool:
+    # Runs once per server process, not once per session/rerun.
+    start_background_indexer()
+    return True
+
+
+if BACKGROUND_INDEXING:
+    _start_indexer()
+
 tab1, tab2, tab3 = st.tabs(
     ["Patient / Attendant View", "Doctor / Admin View", "Agent Logs & Evaluation"]
 )
@@ -105,6 +124,61 @@ with tab2:
         """
     )
 
+    st.markdown("#### Bulk import (CSV / Excel / JSONL)")
+    st.caption(
+        "Slots need doctor_name, speciality, date, time_slot (optional status, patient_name). "
+        "Notes need patient_name, note (optional conditions, medications, timestamp). "
+        "Rows already present are skipped."
+    )
+    import_kind = st.radio("Import", ["Appointment slots", "Patient notes"], horizontal=True)
+    upload = st.file_uploader("Batch file", type=["csv", "xlsx", "xls", "jsonl"])
+    if upload is not None and st.button("Import batch"):
+        importer = (
+            import_appointment_slots if import_kind == "Appointment slots" else import_patient_notes
+        )
+        try:
+            st.json(importer(upload))
+        except ValueError as e:
+            st.error(str(e))
+
+    st.markdown("#### Shared resource cache")
+    st.caption(
+        "LLM client, embedding model, vector indexes and appointment data are "
+        "shared across all sessions and rebuilt automatically when their "
+        "source files change."
+    )
+    cache_rows = resource_cache.cache_stats()
+    measured = [r["approx_mb"] for r in cache_rows if r["approx_mb"] is not None]
+    col_a, col_b, col_c, col_d = st.columns(4)
+    col_a.metric("Cached objects", len(cache_rows))
+    col_b.metric(
+        "Approx. cache size (MB)",
+        round(sum(measured), 2),
+        help="Excludes objects whose size is not measured (e.g. the LLM client).",
+    )
+    col_c.metric("Process RSS now (MB)", resource_cache.process_rss_mb())
+    col_d.metric("Process RSS high-water mark (MB)", resource_cache.process_peak_rss_mb())
+    if cache_rows:
+        st.dataframe(cache_rows)
+
+    st.markdown("#### Background indexer")
+    st.json(indexer_status())
+    inline_builds = patient_index_build_stats()
+    if inline_builds:
+        st.markdown("**Inline patient index builds (chunks, seconds, RSS MB sampled during the build)**")
+        st.dataframe([{"patient": name, **stats} for name, stats in inline_builds.items()])
+    if GLOBAL_PATIENT_INDEX:
+        st.markdown("#### Global patient index")
+        st.json(patient_index_stats())
+
+    invalidate_target = st.selectbox(
+        "Invalidate",
+        ["all", "appointments", "disease_index", "patient_index", "llm", "embeddings"],
+    )
+    if st.button("Invalidate cache"):
+        dropped = resource_cache.invalidate("" if invalidate_target == "all" else invalidate_target)
+        st.success(f"Dropped {dropped} cached object(s).")
+
 # ---------------------------
 # TAB 3: AGENT LOGS, MEMORY & PLANNING
 # ---------------------------
@@ -125,6 +199,28 @@ with tab3:
     else:
         st.info("No evaluation yet. Run the assistant to generate one.")
 
+    # LLM scheduler
+    st.markdown("#### LLM Scheduler (rate limits & queues)")
+    sched = llm_scheduler_stats()
+    col_a, col_b, col_c, col_d = st.columns(4)
+    col_a.metric("Active calls", sched["active"])
+    col_b.metric("Queue depth", sched["queue_depth"])
+    col_c.metric("Retries", sched["retries"])
+    col_d.metric("Rate-limited (429/5xx)", sched["rate_limited"])
+    st.dataframe(
+        [{"priority": name, **m} for name, m in sched["priorities"].items()]
+    )
+
+    # Request coalescing counters
+    st.markdown("#### Request Coalescing (single-flight)")
+    sf_stats = get_single_flight_stats()
+    if sf_stats:
+        st.dataframe(
+            [{"group": name, **counters} for name, counters in sf_stats.items()]
+        )
+    else:
+        st.info("No coalesced tool calls recorded yet.")
+
     # Patient memory viewer
     st.markdown("#### Patient Memory & Notes")
     mem_patient = st.text_input("Enter patient name to inspect memory", "")